@@ -1,8 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, eq=False)
 class Employee:
-    def __init__(self, name: str, qualifications: list[str], vacations: list[int]):
-        self.name = name
-        self.qualifications = qualifications
-        self.vacations = vacations
+    name: str
+    qualifications: frozenset[str]
+    vacations: frozenset[int]
 
     def __str__(self):
         return self.name
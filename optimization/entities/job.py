@@ -1,19 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, eq=False)
 class Job:
-    def __init__(
-        self,
-        name: str,
-        gain: int,
-        due_date: int,
-        daily_penalty: int,
-        working_days_per_qualification: dict[str, int],
-    ):
-        self.name: str = name
-        self.gain: int = gain
-        self.due_date: int = due_date
-        self.daily_penalty: int = daily_penalty
-        self.working_days_per_qualification: dict[
-            str, int
-        ] = working_days_per_qualification
+    name: str
+    gain: int
+    due_date: int
+    daily_penalty: int
+    working_days_per_qualification: dict[str, int]
 
     def __str__(self):
         return self.name
@@ -1,6 +1,9 @@
 from typing import TypedDict
 
-from optimization.entities import Job, Employee
+from .employee import Employee
+from .job import Job
+
+__all__ = ["ProblemData"]
 
 
 class ProblemData(TypedDict):
@@ -0,0 +1,84 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the heuristic then runs as plain Python
+
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+
+# Greedy schedule used as a MIP start: jobs are taken by decreasing priority and
+# each one is staffed, if possible, inside the earliest window of at most
+# max_duration_project days. A job that can't be fully staffed is left undone.
+# Only NumPy arrays and scalars are used so that numba can compile it.
+@njit(cache=True)
+def greedy_schedule(
+    admissible: np.ndarray,
+    required: np.ndarray,
+    order: np.ndarray,
+    max_nb_projects_per_employee: int,
+    max_duration_project: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    nS, nJ, nQ, nH = admissible.shape
+    duration: int = min(max_duration_project, nH)
+
+    x: np.ndarray = np.zeros((nS, nJ, nQ, nH), dtype=np.int8)
+    y: np.ndarray = np.zeros(nJ, dtype=np.int8)
+    z: np.ndarray = np.zeros((nS, nJ), dtype=np.int8)
+    busy: np.ndarray = np.zeros((nS, nH), dtype=np.bool_)
+    nb_projects: np.ndarray = np.zeros(nS, dtype=np.int64)
+
+    for j in order:
+        for start in range(nH - duration + 1):
+            trial_busy: np.ndarray = busy.copy()
+            trial_x: np.ndarray = np.zeros((nS, nQ, nH), dtype=np.int8)
+            trial_z: np.ndarray = np.zeros(nS, dtype=np.bool_)
+            staffed: bool = True
+            for k in range(nQ):
+                remaining: int = required[j, k]
+                for t in range(start, start + duration):
+                    for i in range(nS):
+                        if remaining == 0:
+                            break
+                        if (
+                            admissible[i, j, k, t]
+                            and not trial_busy[i, t]
+                            and (
+                                trial_z[i]
+                                or nb_projects[i] < max_nb_projects_per_employee
+                            )
+                        ):
+                            trial_x[i, k, t] = 1
+                            trial_busy[i, t] = True
+                            trial_z[i] = True
+                            remaining -= 1
+                if remaining > 0:
+                    staffed = False
+                    break
+            if staffed:
+                busy = trial_busy
+                x[:, j, :, :] = trial_x
+                y[j] = 1
+                for i in range(nS):
+                    if trial_z[i]:
+                        z[i, j] = 1
+                        nb_projects[i] += 1
+                break
+
+    return x, y, z
+
+
+# Reorder the rows of interchangeable employees by decreasing number of projects,
+# so that the schedule satisfies the symmetry-breaking constraints of the model
+def sort_interchangeable(
+    x: np.ndarray, z: np.ndarray, groups: list[list[int]]
+) -> tuple[np.ndarray, np.ndarray]:
+    x = x.copy()
+    z = z.copy()
+    for group in groups:
+        members: np.ndarray = np.array(group)
+        ranked: np.ndarray = members[np.argsort(-z[members].sum(axis=1), kind="stable")]
+        x[members] = x[ranked]
+        z[members] = z[ranked]
+    return x, z
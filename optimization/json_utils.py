@@ -0,0 +1,17 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back on the standard library
+    orjson = None
+
+
+def load_json(file_path: str):
+    with open(file_path, "rb") as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
+
+
+# Written with the standard library so the output keeps its usual layout
+def dump_json(data, file_path: str) -> None:
+    with open(file_path, "w") as f:
+        json.dump(data, f)
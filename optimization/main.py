@@ -1,12 +1,53 @@
 import json
-import multiprocessing
 import os
+import pickle
 import sys
+import tempfile
 
 import gurobipy
+import numpy as np
 from tqdm import tqdm
 
 from .entities import ProblemData, Employee, Job
+from .heuristics import greedy_schedule, sort_interchangeable
+from .json_utils import load_json
+
+# Gurobi parameters applied by solve_model, overridable through solver_options
+DEFAULT_SOLVER_OPTIONS: dict[str, int | float] = {
+    "Presolve": 1,
+    "Method": 2,
+    "MIPFocus": 1,
+    "MIPGap": 1e-4,
+    "Cuts": 2,
+    "Heuristics": 0.2,
+    "Symmetry": 2,
+    "Threads": 0,
+    "PoolSearchMode": 0,
+    "PoolSolutions": 1,
+}
+
+# Bump when Employee, Job or ProblemData change so that stale pickles are ignored
+DATA_CACHE_VERSION: int = 1
+
+# Environment variables prefixed this way override a solver option in main,
+# e.g. COMPUOPTI_MIPFocus=3 (Gurobi parameter names are case-insensitive)
+SOLVER_OPTION_ENV_PREFIX: str = "COMPUOPTI_"
+
+
+def get_solver_options() -> dict[str, int | float | str]:
+    options: dict[str, int | float | str] = {}
+    for key, value in os.environ.items():
+        if not key.startswith(SOLVER_OPTION_ENV_PREFIX):
+            continue
+        name: str = key[len(SOLVER_OPTION_ENV_PREFIX) :]
+        try:
+            options[name] = int(value)
+        except ValueError:
+            try:
+                options[name] = float(value)
+            except ValueError:  # string parameters such as LogFile
+                options[name] = value
+    return options
 
 
 def get_data(size: str) -> ProblemData:
@@ -19,16 +60,22 @@ def get_data(size: str) -> ProblemData:
     else:
         raise ValueError(f"Unknown size {size}")
 
-    with open(file) as f:
-        data: dict = json.load(f)
+    # Parsed instances are cached next to the JSON file until it is modified
+    cache_file: str = f"{file}.v{DATA_CACHE_VERSION}.pkl"
+    is_cached: bool = os.path.exists(cache_file)
+    if is_cached and os.path.getmtime(cache_file) > os.path.getmtime(file):
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+
+    data: dict = load_json(file)
 
     data["staff"] = [
         Employee(
             name=employee["name"],
-            qualifications=employee["qualifications"],
-            vacations=employee["vacations"],
+            qualifications=frozenset(employee["qualifications"]),
+            vacations=frozenset(employee["vacations"]),
         )
-        for index, employee in enumerate(data["staff"])
+        for employee in data["staff"]
     ]
 
     data["jobs"] = [
@@ -39,54 +86,80 @@ def get_data(size: str) -> ProblemData:
             daily_penalty=job["daily_penalty"],
             working_days_per_qualification=job["working_days_per_qualification"],
         )
-        for index, job in enumerate(data["jobs"])
+        for job in data["jobs"]
     ]
 
+    # Written to a temporary file first: concurrent runs must never load a
+    # partially written cache. The cache is optional, a failed write is ignored.
+    try:
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(file), suffix=".pkl")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            os.remove(tmp_file)
+            raise
+    except OSError:
+        pass
+
     return data
 
 
-def solve_problem(
+# Build the model once, independently of the run parameters. The constraints on
+# the number of projects per employee and on the duration of a project are
+# returned with it: their right-hand sides are set by solve_model for each run.
+def build_model(
     data: ProblemData,
-    max_nb_projects_per_employee: int,
-    max_duration_project: int,
-    timeout: int = 0,
-) -> float:
+) -> tuple[gurobipy.Model, gurobipy.MConstr, gurobipy.MConstr]:
     H: list[int] = list(range(1, data["horizon"] + 1))
     Q: list[str] = data["qualifications"]
     S: list[Employee] = data["staff"]
     J: list[Job] = data["jobs"]
+    nS: int = len(S)
+    nJ: int = len(J)
+    nQ: int = len(Q)
+    nH: int = len(H)
 
     # Pour i ∈ S, un membre du personnel i est caractérisé par :
-    # – un sous-ensemble de qualifications Q_i^S ⊆ Q ;
-    # – un sous-ensemble de jours de congés V_i^S ⊆ H ;
-    Q_i_S: dict[Employee, list[str]] = {
-        employee: employee.qualifications for employee in S
-    }
-
-    V_i_S: dict[Employee, list[int]] = {employee: employee.vacations for employee in S}
+    # – un sous-ensemble de qualifications Q_i^S ⊆ Q (i.qualifications) ;
+    # – un sous-ensemble de jours de congés V_i^S ⊆ H (i.vacations) ;
 
     # Pour j ∈ J, un job j est caractérisé par :
-    # – un sous-ensemble de qualifications Q_j^J ⊆ Q ;
-    Q_j_J: dict[Job, list[str]] = {
-        job: list(job.working_days_per_qualification.keys()) for job in J
-    }
+    # – un sous-ensemble de qualifications Q_j^J ⊆ Q
+    #   (les clés de j.working_days_per_qualification) ;
     # – des nombres de jours/personnes n_j,k ∈ N
-    # pour chaque qualification d’intérêt k ∈ Q_j^J
-    n_j_k: dict[Job, dict[str, int]] = {
-        job: {
-            qualification: job.working_days_per_qualification[qualification]
-            for qualification in job.working_days_per_qualification
-        }
-        for job in J
-    }
-    # – un gain g_j ∈ N obtenu lorsque le job j est accompli ;
-    g_j: dict[Job, int] = {job: job.gain for job in J}
-
-    # – une pénalité financière par journée de retard c_j ∈ N
-    c_j: dict[Job, int] = {job: job.daily_penalty for job in J}
-
-    # - une date de fin d_j est prévue pour le job j
-    d_j: dict[Job, int] = {job: job.due_date for job in J}
+    #   pour chaque qualification d’intérêt k ∈ Q_j^J
+    #   (j.working_days_per_qualification[k]) ;
+    # – un gain g_j ∈ N obtenu lorsque le job j est accompli (j.gain) ;
+    # – une pénalité financière par journée de retard c_j ∈ N (j.daily_penalty) ;
+    # - une date de fin d_j est prévue pour le job j (j.due_date)
+
+    # Integer positions of the qualifications along the k axis
+    q_idx: dict[str, int] = {qualification: k for k, qualification in enumerate(Q)}
+    t_arr: np.ndarray = np.array(H)
+
+    # The entity fields are flattened into arrays, one pass over the staff and
+    # one over the jobs: the model below only reads these arrays
+    has_qualification: np.ndarray = np.zeros((nS, nQ), dtype=bool)
+    on_vacation: np.ndarray = np.zeros((nS, nH), dtype=bool)
+    for i, employee in enumerate(S):
+        has_qualification[i, [q_idx[k] for k in employee.qualifications]] = True
+        on_vacation[i, [t - 1 for t in employee.vacations]] = True
+
+    # n_j,k as a (|J|, |Q|) matrix, 0 where k is not in Q_j^J
+    needs_qualification: np.ndarray = np.zeros((nJ, nQ), dtype=bool)
+    n_mat: np.ndarray = np.zeros((nJ, nQ))
+    g: np.ndarray = np.empty(nJ)
+    c: np.ndarray = np.empty(nJ)
+    d: np.ndarray = np.empty(nJ)
+    for j, job in enumerate(J):
+        for k, n in job.working_days_per_qualification.items():
+            needs_qualification[j, q_idx[k]] = True
+            n_mat[j, q_idx[k]] = n
+        g[j] = job.gain
+        c[j] = job.daily_penalty
+        d[j] = job.due_date
 
     # Create a new model
     model: gurobipy.Model = gurobipy.Model("CompuOpti")
@@ -97,136 +170,200 @@ def solve_problem(
     #   la personne i réalise une qualification q pour le job j pendant la journée t,
     # 0 sinon,
     # pour i ∈ S, j ∈ J, k ∈ Q, t ∈ H.
-    X = model.addVars(
-        [(i, j, k, t) for i in S for j in J for k in Q for t in H],
+    #
+    # Entries that can never be 1 are fixed at creation (ub = 0) instead of being
+    # constrained afterwards:
+    # X[i, j, k, t] = 0
+    # for all i in S, j in J, k in Q if k not in Q_i^S or k not in Q_j^J, for t in H
+    # Can't work
+    #   if employee doesn't have the qualification
+    #   or if job doesn't require this qualification
+    #
+    # X[i, j, k, t] = 0 for all i in S, j in J, k in Q, t in V_i_S
+    # Can't work during vacations
+    X_ub: np.ndarray = (
+        has_qualification[:, None, :, None]
+        & needs_qualification[None, :, :, None]
+        & ~on_vacation[:, None, None, :]
+    ).astype(float)
+
+    X = model.addMVar(
+        (nS, nJ, nQ, nH),
         vtype=gurobipy.GRB.BINARY,
+        ub=X_ub,
         name="X",
     )
 
+    # maximize(Somme for j in J of (Y_j × gj − Lj × cj) Objectif: Maximizer la somme
+    # des différences des gains et des pertes pour chaque projet
+    # The coefficients are given to Y and L at creation, no expression is built
+    model.ModelSense = gurobipy.GRB.MAXIMIZE
+
     # Yj ∈ {0, 1} vaut 1 si le job j est réalisé totalement, 0 sinon, j ∈ J
-    Y = model.addVars(J, vtype=gurobipy.GRB.BINARY, name="Y")
+    Y = model.addMVar(nJ, vtype=gurobipy.GRB.BINARY, obj=g, name="Y")
+
+    # L, E and B take integer values at the optimum since X and the days are
+    # integer: they are declared continuous to avoid branching on them
+    first_day: int = H[0]
+    last_day: int = H[-1]
 
     # Lj nombre de jours de retard pour le job j ∈ J
-    L = model.addVars(J, vtype=gurobipy.GRB.INTEGER, name="L")
+    L = model.addMVar(nJ, vtype=gurobipy.GRB.CONTINUOUS, obj=-c, name="L", lb=0)
 
     # Ej date de fin de réalisation du job j ∈ J
-    E = model.addVars(J, vtype=gurobipy.GRB.INTEGER, name="E", lb=min(H), ub=max(H))
+    E = model.addMVar(
+        nJ,
+        vtype=gurobipy.GRB.CONTINUOUS,
+        name="E",
+        lb=first_day,
+        ub=last_day,
+    )
 
-    Z = model.addVars(
-        [(i, j) for i in S for j in J],
+    # Zi,j ∈ {0, 1} vaut 1 si la personne i travaille sur le job j
+    # Fixed to 0 when i can't work on any qualification of j on any day
+    Z = model.addMVar(
+        (nS, nJ),
         vtype=gurobipy.GRB.BINARY,
+        ub=X_ub.any(axis=(2, 3)).astype(float),
         name="Z",
     )
 
-    B = model.addVars(J, vtype=gurobipy.GRB.INTEGER, name="B", lb=min(H), ub=max(H))
-
-    model.update()
-
-    # maximize(Somme for j in J of (Y_j × gj − Lj × cj) Objectif: Maximizer la somme
-    # des différences des gains et des pertes pour chaque projet
-    model.setObjective(
-        gurobipy.quicksum(Y[j] * g_j[j] - L[j] * c_j[j] for j in J),
-        gurobipy.GRB.MAXIMIZE,
+    B = model.addMVar(
+        nJ,
+        vtype=gurobipy.GRB.CONTINUOUS,
+        name="B",
+        lb=first_day,
+        ub=last_day,
     )
 
+    W = model.addMVar((nJ, nH), vtype=gurobipy.GRB.BINARY, name="W")
+
     # Somme for j in J, k in Q of (X[i, j, k, t] <= 1 for all i in S, t in H)
     # Max of 1 qualification assigned per job for each employee for each day
-    model.addConstrs(
-        gurobipy.quicksum(X[i, j, k, t] for j in J for k in Q) <= 1
-        for i in S
-        for t in H
-    )
-
-    # Somme for j in J, k in Q of (X[i, j, k, t] = 0 for all i in S, t in V_i_S)
-    # Can't work during vacations
-    model.addConstrs(
-        gurobipy.quicksum(X[i, j, k, t] for j in J for k in Q) == 0
-        for i in S
-        for t in V_i_S[i]
-    )
-
-    # X[i, j, k, t] = 0
-    # for all i in S, j in J, k in Q if k not in Q_i^S or k not in Q_j^J, for t in H
-    # Can't work
-    #   if employee doesn't have the qualification
-    #   or if job doesn't require this qualification
-    model.addConstrs(
-        (
-            X[i, j, k, t] == 0
-            for i in S
-            for j in J
-            for k in Q
-            for t in H
-            if k not in Q_i_S[i] or k not in Q_j_J[j]
-        ),
-    )
+    # Only needed where more than one X[i, :, :, t] is free: vacation days and
+    # days with a single admissible assignment don't get a row
+    cap_i, cap_t = np.nonzero(X_ub.sum(axis=(1, 2)) > 1)
+    if cap_i.size:
+        model.addConstr(X[cap_i, :, :, cap_t].sum(axis=(1, 2)) <= 1)
 
     # Yj × n_j,k ≤ Somme for i in S, t in H of (X[i, j, k, t] for j in J for k in Q_j^J)
     # Days worked must be superior or equal to number of days required if job is done
-    model.addConstrs(
-        (
-            Y[j] * n_j_k[j][k] <= gurobipy.quicksum(X[i, j, k, t] for i in S for t in H)
-            for j in J
-            for k in Q_j_J[j]
-        ),
+    # One row per (j, k ∈ Q_j^J), gathered through the required (j, k) pairs
+    req_j, req_k = np.nonzero(needs_qualification)
+    model.addConstr(
+        Y[req_j] * n_mat[req_j, req_k] <= X[:, req_j, req_k, :].sum(axis=(0, 2))
     )
 
     # Somme for i in S, t in H of (X[i, j, k, t] <= n_j_k for j in J for k in Q_j^J)
     # Days worked per qualification must be inferior or equal to days required
-    model.addConstrs(
-        (
-            gurobipy.quicksum(X[i, j, k, t] for i in S for t in H) <= n_j_k[j][k]
-            for j in J
-            for k in Q_j_J[j]
-        ),
-    )
+    model.addConstr(X.sum(axis=(0, 3)) <= n_mat)
 
-    # Xi,j,k,t × t ≤ Ej ∀ i ∈ S, ∀ j ∈ J , ∀ k ∈ Q, ∀ t ∈ H
+    # Flat (job, day) index pairs covering J × H, to add the per-(j, t) rows of
+    # E and B in a single call each
+    jt_j, jt_t = np.indices((nJ, nH)).reshape(2, -1)
+
+    # Wj,t × t ≤ Ej ∀ j ∈ J, ∀ t ∈ H
     # End date of a job must be superior or equal to last day of work
-    model.addConstrs(
-        (X[i, j, k, t] * t <= E[j] for i in S for j in J for k in Q for t in H),
-    )
+    model.addConstr(W[jt_j, jt_t] * t_arr[jt_t] <= E[jt_j])
 
     # Ej − dj ≤ Lj ∀ j ∈ J
     # Number of late days must be superior or equal to end date - due date
-    model.addConstrs((E[j] - d_j[j] <= L[j] for j in J))
+    model.addConstr(E - L <= d)
 
     # Create a constraint to link Z and X
     # Z = 0 if X = 0
-    model.addConstrs(
-        (
-            Z[i, j] <= gurobipy.quicksum(X[i, j, k, t] for t in H for k in Q)
-            for i in S
-            for j in J
-        )
-    )
+    model.addConstr(Z <= X.sum(axis=(2, 3)))
 
     # Z = 1 if X >= 1
-    model.addConstrs(
-        (Z[i, j] >= X[i, j, k, t] for i in S for j in J for k in Q for t in H)
-    )
+    # An employee works at most |H| days on a job, so |H| × Zi,j bounds the sum
+    model.addConstr(X.sum(axis=(2, 3)) <= nH * Z)
 
     # Max of projects per employee must be equal to max_nb_projects_per_employee
-    model.addConstrs(
-        (
-            gurobipy.quicksum(Z[i, j] for j in J) <= max_nb_projects_per_employee
-            for i in S
-        )
-    )
-
-    # # Start date of a job must be inferior or equal to all days of work
-    model.addConstrs(
-        (B[j] * X[i, j, k, t] <= t for i in S for j in J for k in Q for t in H),
-    )
+    # (right-hand side set by solve_model)
+    max_projects: gurobipy.MConstr = model.addConstr(Z.sum(axis=1) <= nJ)
+
+    # Employees with the same qualifications and vacations are interchangeable:
+    # order them by decreasing number of projects to break the symmetry
+    # (the rows of the qualification and vacation masks identify them)
+    groups: dict[bytes, list[int]] = {}
+    profiles: np.ndarray = np.hstack((has_qualification, on_vacation))
+    for i in range(nS):
+        groups.setdefault(profiles[i].tobytes(), []).append(i)
+    # Consecutive members of every group, added as one block
+    first: list[int] = []
+    second: list[int] = []
+    for group in groups.values():
+        first.extend(group[:-1])
+        second.extend(group[1:])
+    if first:
+        model.addConstr(Z[first, :].sum(axis=1) >= Z[second, :].sum(axis=1))
+
+    # Wj,t = 1 if job j is worked on during day t
+    # Wj,t ≥ Xi,j,k,t ∀ i ∈ S, ∀ j ∈ J , ∀ k ∈ Q, ∀ t ∈ H
+    # Only built for the entries of X that are not fixed to 0
+    free_i, free_j, free_k, free_t = np.nonzero(X_ub)
+    if free_i.size:
+        model.addConstr(W[free_j, free_t] >= X[free_i, free_j, free_k, free_t])
+
+    # Bj ≤ t + M × (1 - Wj,t) ∀ j ∈ J, ∀ t ∈ H
+    # Start date of a job must be inferior or equal to all days of work
+    # (big-M linearization of Bj × Xi,j,k,t ≤ t, with M = horizon)
+    model.addConstr(B[jt_j] <= t_arr[jt_t] + nH * (1 - W[jt_j, jt_t]))
 
     # Duration of a job must be inferior or equal to max_duration_project
-    model.addConstrs((E[j] - B[j] <= max_duration_project - 1 for j in J))
+    # (right-hand side set by solve_model)
+    max_duration: gurobipy.MConstr = model.addConstr(E - B <= nH - 1)
+
+    # Kept on the model for the greedy start computed by solve_model
+    model._X, model._Y, model._Z = X, Y, Z
+    model._admissible = X_ub > 0
+    model._required = n_mat.astype(np.int64)
+    model._order = np.argsort(-g / (d + 1), kind="stable")
+    model._groups = list(groups.values())
+
+    return model, max_projects, max_duration
+
+
+# Only the right-hand sides change between runs, so the model is built once and
+# each run is warm-started with the greedy schedule for the current bounds.
+def solve_model(
+    model: gurobipy.Model,
+    max_projects: gurobipy.MConstr,
+    max_duration: gurobipy.MConstr,
+    max_nb_projects_per_employee: int,
+    max_duration_project: int,
+    timeout: int = 0,
+    solver_options: dict[str, int | float | str] | None = None,
+) -> float:
+    max_projects.RHS = max_nb_projects_per_employee
+    max_duration.RHS = max_duration_project - 1
+
+    # Warm start: jobs by decreasing gain / (due date + 1), staffed greedily
+    x, y, z = greedy_schedule(
+        model._admissible,
+        model._required,
+        model._order,
+        max_nb_projects_per_employee,
+        max_duration_project,
+    )
+    x, z = sort_interchangeable(x, z, model._groups)
+    model._X.Start = x
+    model._Y.Start = y
+    model._Z.Start = z
 
     # Parameters
+    # The model is re-solved across runs: start from Gurobi's defaults so that
+    # options passed to a previous call don't carry over
+    model.resetParams()
     # model.Params.OutputFlag = 0
-    model.Params.PoolSearchMode = 0
-    model.Params.PoolSolutions = 1
-    model.Params.Threads = multiprocessing.cpu_count()
+    # With PoolSearchMode = 0, asking for PoolSolutions > 1 keeps the incumbents
+    # found along the way without proving each of them optimal
+    options: dict[str, int | float | str] = {
+        **DEFAULT_SOLVER_OPTIONS,
+        **(solver_options or {}),
+    }
+    for name, value in options.items():
+        model.setParam(name, value)
     if timeout > 0:
         model.Params.TimeLimit = timeout
 
@@ -234,6 +371,25 @@ def solve_problem(
     return model.objVal
 
 
+def solve_problem(
+    data: ProblemData,
+    max_nb_projects_per_employee: int,
+    max_duration_project: int,
+    timeout: int = 0,
+    solver_options: dict[str, int | float | str] | None = None,
+) -> float:
+    model, max_projects, max_duration = build_model(data)
+    return solve_model(
+        model,
+        max_projects,
+        max_duration,
+        max_nb_projects_per_employee,
+        max_duration_project,
+        timeout,
+        solver_options,
+    )
+
+
 def main() -> None:
     size: str = sys.argv[1]
     is_odd: bool = int(sys.argv[2]) % 2 == 1
@@ -243,6 +399,8 @@ def main() -> None:
         timeout: int = 0
 
     data: ProblemData = get_data(size)
+    model, max_projects, max_duration = build_model(data)
+    solver_options: dict[str, int | float | str] = get_solver_options()
     folder_path: str = f"solutions/{size}"
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
@@ -251,8 +409,7 @@ def main() -> None:
         print(f"================== Day {day} ==================")
         file_path: str = f"{folder_path}/{day}.json"
         try:
-            with open(file_path, "r") as f:
-                solutions: dict = json.load(f)
+            solutions: dict = load_json(file_path)
         except FileNotFoundError:
             solutions: dict = {}
 
@@ -262,7 +419,15 @@ def main() -> None:
             )
             if str(nb_project) in solutions:
                 continue
-            solution: float = solve_problem(data, day, nb_project, timeout)
+            solution: float = solve_model(
+                model,
+                max_projects,
+                max_duration,
+                day,
+                nb_project,
+                timeout,
+                solver_options,
+            )
             solutions[nb_project] = solution
             with open(file_path, "w") as f:
                 json.dump(solutions, f, indent=4)
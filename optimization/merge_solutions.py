@@ -1,24 +1,30 @@
-import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from .json_utils import dump_json, load_json
+
+
+def load_solution(entry: tuple[int, str]) -> tuple[int, dict]:
+    day, file_path = entry
+    return day, load_json(file_path)
 
 
 def main() -> None:
     size: str = sys.argv[1]
-    solutions: dict = {}
     folder_path: str = f"solutions/{size}"
-    for file in sorted(
-        [f for f in os.listdir(folder_path) if f.split(".")[0].isdigit()],
-        key=lambda x: int(x.split(".")[0]),
-        reverse=True,
-    ):
-        file_path: str = f"{folder_path}/{file}"
-        day: int = int(file.split(".")[0])
-        with open(file_path, "r") as f:
-            solutions[day] = json.load(f)
-
-    with open(f"{folder_path}/solutions.json", "w") as f:
-        json.dump(solutions, f)
+    entries: list[tuple[int, str]] = []
+    for entry in os.scandir(folder_path):
+        stem: str = entry.name.split(".")[0]
+        if stem.isdigit():
+            entries.append((int(stem), entry.path))
+    entries.sort(key=itemgetter(0), reverse=True)
+
+    with ThreadPoolExecutor() as executor:
+        solutions: dict = dict(executor.map(load_solution, entries))
+
+    dump_json(solutions, f"{folder_path}/solutions.json")
 
 
 if __name__ == "__main__":